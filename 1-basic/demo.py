@@ -1,8 +1,9 @@
 from fastapi import FastAPI, Query, Path, HTTPException
-from typing import Optional
+from fastapi.responses import ORJSONResponse
+from typing import Annotated, Optional
 
 # 创建 FastAPI 实例
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)  # orjson序列化响应，比默认JSONResponse快
 
 # 伪造数据，直接使用字典列表
 items = [
@@ -12,11 +13,29 @@ items = [
     {"id": 3, "name": "orange", "price": 4.2},
 ]
 
+# 按ID建立索引，O(1)哈希查找代替每次请求的O(n)线性扫描
+# setdefault保证重复ID时保留第一条，与原来线性扫描"返回第一个匹配"的行为一致
+items_by_id = {}
+for item in items:
+    items_by_id.setdefault(item["id"], item)
+
+# 把Path(...)约束提升为模块级的Annotated类型别名：FieldInfo在导入时只实例化一次，
+# 多个路由可以复用同一份校验定义，而不是在每个函数签名里重复构造
+ItemId = Annotated[int, Path(
+    description="商品ID",
+    gt=0,               # 大于0
+    le=1000,            # 小于等于1000
+    title="商品标识符",   # 在文档中显示的标题
+)]
+ProductId = Annotated[int, Path(description="产品ID", gt=0)]
+
 # 方法：@app.get 装饰器定义路由，Query参数处理查询参数
 # 知识点：Optional类型提示，返回类型注解，Query参数校验
 # 参数类型：name - 类型参数(Typed Parameter)，使用Query修饰
+# 注意：这些处理函数都是纯内存操作，没有阻塞调用，用async def可以直接在事件循环上执行，
+# 避免普通def每次请求都要经过线程池调度（上下文切换+GIL切换）的开销
 @app.get("/items/")
-def get_items(
+async def get_items(
     name: Optional[str] = Query(None, description="按名称过滤（可选）")
 ) -> list[dict]:
     """
@@ -32,7 +51,7 @@ def get_items(
 # 知识点：Path必填参数(...表示必填)，返回类型注解，HTTPException异常处理
 # 参数类型：item_id - 路径参数(Path Parameter)，使用Path修饰
 @app.get("/items/{item_id}")
-def get_item_by_id(
+async def get_item_by_id(
     item_id: int = Path(..., description="按 ID 查询商品", gt=0)
 ) -> dict:
     """
@@ -46,19 +65,16 @@ def get_item_by_id(
     - gt=0 表示数值需要大于0（gt: greater than）
     - 支持的验证参数包括：gt, ge, lt, le, regex等
     """
-    for item in items:
-        if item["id"] == item_id:
-            if isinstance(item, dict):
-                return item
-            else:
-                raise HTTPException(status_code=404, detail="Item not found")
+    item = items_by_id.get(item_id)
+    if item is not None:
+        return item
     raise HTTPException(status_code=404, detail="Item not found")
 
 # 方法：Query处理多个查询参数，设置默认值
 # 知识点：多参数处理，返回值类型校验，参数默认值设置
 # 参数类型：price, tax - 类型参数(Typed Parameter)，使用Query修饰
 @app.get("/calc")
-def calc_price(
+async def calc_price(
     price: float = Query(..., description="基础价格"),
     tax: float = Query(0.1, description="税率，默认0.1")
 ) -> float:
@@ -72,7 +88,7 @@ def calc_price(
 # 知识点：多路径参数解析，类型校验，错误处理
 # 参数类型：a, b - 路径参数(Path Parameter)，使用Path修饰
 @app.get("/divide/{a}/{b}")
-def divide(
+async def divide(
     a: int = Path(..., description="被除数"),
     b: int = Path(..., description="除数", ne=0)
 ) -> float:
@@ -93,7 +109,7 @@ def divide(
 # 知识点：多条件过滤，链式过滤，Optional参数处理
 # 参数类型：name, price - 类型参数(Typed Parameter)，使用Query修饰
 @app.get("/items/search")
-def search_items(
+async def search_items(
     name: Optional[str] = Query(None, description="按名称搜索"),
     price: Optional[float] = Query(None, description="按价格搜索")
 ) -> list[dict]:
@@ -103,19 +119,19 @@ def search_items(
     - FastAPI 会根据类型自动转换和校验。
     - 返回匹配的项组成的 list。
     """
-    results = items
-    if name is not None:
-        results = [item for item in results if item["name"] == name]
-    if price is not None:
-        results = [item for item in results if item["price"] == price]
-    return results
+    # 循环融合：所有条件在一次遍历里判断完，不再按条件逐个重建列表
+    return [
+        item for item in items
+        if (name is None or item["name"] == name)
+        and (price is None or item["price"] == price)
+    ]
 
 # 方法：使用Python 3.10+ 联合类型语法(|)代替Optional
 # 知识点：新型联合类型语法，None默认值处理，skip_validating设置
 # 参数类型：min_price, max_price, category - 类型参数(Typed Parameter)，使用Query修饰
 # 参数类型：skip_validating - 普通参数(Normal Parameter)，有默认值
 @app.get("/items/filter")
-def filter_items(
+async def filter_items(
     min_price: float | None = Query(None, description="最低价格过滤", ge=0),
     max_price: int | None = Query(None, description="最高价格过滤"),
     category: str | None = Query(None, description="商品类别"),
@@ -130,36 +146,27 @@ def filter_items(
     - category 使用 str|None 替代 Optional[str]
     - 支持多条件组合过滤
     """
-    results = items
-
-    if min_price is not None:
-        results = [item for item in results if item["price"] >= min_price]
-
-    if max_price is not None:
-        results = [item for item in results if item["price"] <= max_price]
-
-    # 假设items中有category字段
-    if category is not None:
-        results = [item for item in results if item.get("category") == category]
-
-    # 演示bool类型参数的使用
-    if skip_validating:
-        return results
+    # 循环融合：原来每个条件都重建一次列表（最多4次完整遍历+分配），
+    # 改为一个谓词函数在单次遍历里判断所有条件
+    def _match(item: dict) -> bool:
+        price = item["price"]
+        if min_price is not None and price < min_price:
+            return False
+        if max_price is not None and price > max_price:
+            return False
+        # 假设items中有category字段
+        if category is not None and item.get("category") != category:
+            return False
+        # 假设有验证逻辑；skip_validating=True时跳过
+        return skip_validating or "validated" in item
 
-    # 假设有验证逻辑
-    return [item for item in results if "validated" in item or not skip_validating]
+    return [item for item in items if _match(item)]
 
 # 添加一个展示Path高级验证的路由
 # 参数类型：item_id - 路径参数(Path Parameter)，使用Path高级验证
 @app.get("/items/validate/{item_id}")
-def validate_item_id(
-    item_id: int = Path(
-        ...,
-        description="商品ID",
-        gt=0,               # 大于0
-        le=1000,            # 小于等于1000
-        title="商品标识符",   # 在文档中显示的标题
-    )
+async def validate_item_id(
+    item_id: ItemId
 ) -> dict:
     """
     Path函数详细使用示例：
@@ -196,8 +203,8 @@ def validate_item_id(
 # 参数类型：user_id - 类型参数(Typed Parameter)，使用Query修饰
 # 参数类型：include_details - 普通参数(Normal Parameter)，有默认值
 @app.get("/products/{product_id}")
-def get_product(
-    product_id: int = Path(..., description="产品ID", gt=0),
+async def get_product(
+    product_id: ProductId,
     user_id: str | None = Query(None, description="用户ID"),
     include_details: bool = False
 ) -> dict:
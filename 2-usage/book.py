@@ -1,98 +1,155 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi import HTTPException
+from fastapi import Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+import numpy as np
+import orjson
 
 from fakedb import loadBook,saveBook
 from schema import BookInput, BookOutput
 
-app = FastAPI(title="Book API", description="Book API", version="1.0.0")
+# 写请求合并（debounce）：增删改不再各自全量落盘，只把_dirty置位，
+# 由后台任务按窗口统一刷盘。突发100次写只序列化/写盘一次，而不是100次。
+_dirty = asyncio.Event()
+
+logger = logging.getLogger(__name__)
+
+async def _flusher():
+    while True:
+        await _dirty.wait()
+        _dirty.clear()
+        try:
+            await saveBook(books)
+        except Exception:
+            # 单次落盘失败（磁盘满等）不能杀死刷盘任务：记录日志、
+            # 重新置位_dirty，下一个窗口再试，保证任务一直活着
+            logger.exception("Failed to flush books to disk; will retry")
+            _dirty.set()
+        # 刷盘间隔至少100ms，窗口内的写请求会被合并到下一次刷盘
+        await asyncio.sleep(0.1)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flush_task = asyncio.create_task(_flusher())
+    yield
+    # 关闭时先取消并等待后台任务退出，再无条件做最后一次全量落盘：
+    # 正在刷盘的任务已经clear了_dirty，若按_dirty判断会把取消时
+    # 写到一半的数据丢掉；无条件再写一次是幂等的，保证已确认的写不丢
+    flush_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await flush_task
+    await saveBook(books)
+
+app = FastAPI(title="Book API", description="Book API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+# 超过500字节的响应做gzip压缩（level=1压缩快、CPU开销小），书籍列表这种JSON能压~5倍
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=1)
 
 books = loadBook()
+# 按ID建立索引（id -> BookOutput），把按ID查找从O(n)线性扫描降为O(1)哈希查找
+# 增删改时需要同步维护这个字典
+books_by_id = {book.id_: book for book in books}
+
+# GET / 的响应缓存：books只在增删改时变化，预先序列化成bytes，
+# 读请求直接返回缓存，省掉每次请求的pydantic序列化和JSON编码
+_books_json_cache: bytes | None = None
+
+# /search 的列式索引：id和type_存成与books平行的NumPy数组，
+# 过滤在C层用布尔掩码完成。目录几万行时，纯Python逐项比较只有每秒几百万次，
+# 向量化掩码能快一到两个数量级
+_ids: np.ndarray | None = None
+_types: np.ndarray | None = None
+
+def _rebuild_cache():
+    global _books_json_cache, _ids, _types
+    _books_json_cache = orjson.dumps([book.model_dump() for book in books])
+    _ids = np.fromiter((book.id_ for book in books), dtype=np.int64, count=len(books))
+    _types = np.array([book.type_ for book in books], dtype=object)
+
+_rebuild_cache()
 
 @app.get("/")
-def load_all_books() -> list[BookOutput]:
+async def load_all_books():
     """
     获取所有书籍
     """
-    print(books)
-    return books
+    # 注意：不声明 -> list[BookOutput] 返回类型，避免FastAPI对缓存内容重复序列化
+    return Response(content=_books_json_cache, media_type="application/json")
 
-@app.get("/search")
-def get_book(book_id: int|None = None, book_type: str|None = None) -> list[BookOutput]:
-    allBook = books
+# response_model=None：books里的对象在加载/写入时已经校验过，读路径跳过响应二次校验
+@app.get("/search", response_model=None)
+async def get_book(book_id: int|None = None, book_type: str|None = None) -> list[BookOutput]:
+    # 布尔掩码过滤：条件比较在NumPy（C层）里完成，Python只负责按下标取回命中的对象
+    mask = np.ones(len(books), dtype=bool)
     if book_id is not None:
-        allBook = [book for book in allBook if book.id_ == book_id]
+        mask &= _ids == book_id
     if book_type is not None:
-        allBook = [book for book in allBook if book.type_ == book_type]
-    return allBook
+        mask &= _types == book_type
+    return [books[i] for i in np.flatnonzero(mask)]
 
-@app.get("/search/{book_id}")
-def get_book_by_id(book_id: int) -> BookOutput:
+@app.get("/search/{book_id}", response_model=None)
+async def get_book_by_id(book_id: int) -> BookOutput:
     """
     根据ID获取书籍
     """
-    for book in books:
-        if book.id_ == book_id:
-            return book
-    raise HTTPException(status_code=404, detail="Book not found")
+    book = books_by_id.get(book_id)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
 
 
 
 @app.post("/append")
-def append_book(book: BookInput) -> BookOutput:
+async def append_book(book: BookInput) -> BookOutput:
     """
     添加书籍
     """
-    bookWithID = BookOutput(
-        id_=len(books) + 1,
-        name=book.name,
-        isbn=book.isbn,
-        type_=book.type_,
-        publish=book.publish,
-        price=book.price
-    )
+    # 用最大ID+1生成新ID，避免删除后len(books)+1产生重复ID
+    next_id = max(books_by_id) + 1 if books_by_id else 1
+    # book已经在请求入口被pydantic校验过了，model_construct直接复用这些字段，
+    # 跳过重复的第二次校验
+    bookWithID = BookOutput.model_construct(id_=next_id, **book.model_dump())
     books.append(bookWithID)
-    try:
-        saveBook(books)
-        return bookWithID
-    except Exception as e:
-        print(f"Error saving book: {e}")
-        raise HTTPException(status_code=500, detail="Error saving book")
+    books_by_id[next_id] = bookWithID
+    _rebuild_cache()
+    # 请求路径上不再同步写盘，置位后由后台任务合并刷盘
+    _dirty.set()
+    return bookWithID
 
 @app.delete("/delete/{book_id}")
-def delete_book(book_id: int):
+async def delete_book(book_id: int):
     """
     删除书籍
     """
-    for book in books:
-        if book.id_ == book_id:
-            books.remove(book)
-            try:
-                saveBook(books)
-                return {"message": "Book deleted successfully"}
-            except Exception as e:
-                print(f"Error delete book: {e}")
-                raise HTTPException(status_code=500, detail="Error deleting book")
-    raise HTTPException(status_code=404, detail="Book not found")
+    book = books_by_id.pop(book_id, None)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    # 用下标del代替books.remove(book)：remove按==逐个比较，而pydantic模型的==要比较所有字段，
+    # 这里按对象身份(is)定位下标，每次比较只是一次指针判断
+    idx = next(i for i, b in enumerate(books) if b is book)
+    del books[idx]
+    _rebuild_cache()
+    _dirty.set()
+    return {"message": "Book deleted successfully"}
 
 @app.put("/update/{book_id}")
-def update_book(book_id: int, book: BookInput) -> BookOutput:
+async def update_book(book_id: int, book: BookInput) -> BookOutput:
     """
     更新书籍
     """
-    for i, b in enumerate(books):
-        if b.id_ == book_id:
-            books[i] = BookOutput(
-                id_=book_id,
-                name=book.name,
-                isbn=book.isbn,
-                type_=book.type_,
-                publish=book.publish,
-                price=book.price
-            )
-            try:
-                saveBook(books)
-                return books[i]
-            except Exception as e:
-                print(f"Error updating book: {e}")
-                raise HTTPException(status_code=500, detail="Error updating book")
-    raise HTTPException(status_code=404, detail="Book not found")
\ No newline at end of file
+    existing = books_by_id.get(book_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    # 直接原地更新已有对象的字段，books列表和books_by_id字典都引用同一个对象，无需再扫描列表
+    existing.name = book.name
+    existing.isbn = book.isbn
+    existing.type_ = book.type_
+    existing.publish = book.publish
+    existing.price = book.price
+    _rebuild_cache()
+    _dirty.set()
+    return existing
\ No newline at end of file
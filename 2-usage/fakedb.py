@@ -1,13 +1,29 @@
-import json
+import os
+
+import aiofiles
+import orjson
+from pydantic import TypeAdapter
 from schema import BookOutput, BookInput
 
+# TypeAdapter在模块加载时构建一次（构建它是最贵的部分），
+# dump_json一次Rust遍历完成整张列表的序列化，不再逐个model_dump
+_BOOK_LIST_ADAPTER = TypeAdapter(list[BookOutput])
+
+# orjson是Rust实现的JSON库，编码比标准库json快2-5倍，解码快2-3倍，直接读写bytes
 def loadBook() -> list:
-    with open('book.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with open('book.json', 'rb') as f:
+        data = orjson.loads(f.read())
         return [BookOutput(**book) for book in data]
 
-def saveBook(books: list[BookInput]) -> None:
-    with open('book.json', 'w', encoding='utf-8') as f:
-        json.dump([book.model_dump() for book in books], f, ensure_ascii=False, indent=4)
+async def saveBook(books: list[BookInput]) -> None:
+    """
+    异步+原子地保存书籍列表：
+    - aiofiles在线程池里执行写入，不会阻塞事件循环，写盘期间其它请求照常处理
+    - 先写临时文件再os.replace原子替换，进程在写一半时崩溃也不会损坏book.json
+    """
+    tmp = 'book.json.tmp'
+    async with aiofiles.open(tmp, 'wb') as f:
+        # indent=2保持文件可读（对应原来的indent=4）
+        await f.write(_BOOK_LIST_ADAPTER.dump_json(books, indent=2))
+    os.replace(tmp, 'book.json')
     return None
-
@@ -12,7 +12,8 @@ from sqlmodel import Field, SQLModel
 class BookInput(SQLModel):
     name: str
     isbn: str
-    type_: str
+    # index=True为type_列建B树索引：按类型查询从全表扫描变成索引查找
+    type_: str = Field(index=True)
     publish: str
     price: float
 
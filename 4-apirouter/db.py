@@ -1,11 +1,24 @@
+import os
+
 from sqlmodel import create_engine, Session
 
-engine = create_engine("sqlite:///books.db", echo=True, connect_args={"check_same_thread": False}) # SQLite数据库引擎，echo=True表示打印SQL语句，建议只在测试环境使用这个参数，connect_args={"check_same_thread": False}表示允许多线程访问
+# echo只在调试时用SQL_ECHO=1打开；显式配置连接池，连接在请求间复用而不是每次重新打开数据库文件
+engine = create_engine(
+    "sqlite:///books.db",
+    echo=os.getenv("SQL_ECHO", "") == "1",
+    connect_args={"check_same_thread": False},  # 允许多线程访问
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
 def get_db_session():
     """
     获取数据库会话
     """
-    with Session(engine) as session:
+    # expire_on_commit=False：commit后返回响应时访问属性不再触发额外SELECT
+    with Session(engine, expire_on_commit=False) as session:
         yield session
         # 它会返回一个生成器函数，使用with语句可以自动管理数据库连接的打开和关闭
         # 这里的yield语句会在with语句结束时自动关闭数据库连接
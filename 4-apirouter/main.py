@@ -29,7 +29,8 @@ app.include_router(author.router)  # 将作者相关的路由添加到FastAPI应
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8008, reload=True)  # 启动FastAPI应用，reload=True表示代码修改后自动重启
+    # loop="uvloop"：uvicorn[standard]自带的libuv事件循环，上下文切换比CPython默认的asyncio循环快数倍
+    uvicorn.run(app, host="0.0.0.0", port=8008, reload=True, loop="uvloop")  # 启动FastAPI应用，reload=True表示代码修改后自动重启
 
 # session.get() vs select() 区别：
 
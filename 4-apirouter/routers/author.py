@@ -1,4 +1,5 @@
 from fastapi import HTTPException, Depends, APIRouter
+from sqlalchemy import insert
 from sqlmodel import Session, select
 from schema import AuthorInput, Author
 from db import get_db_session
@@ -23,10 +24,9 @@ def append_author(author: AuthorInput, session: Session = Depends(get_db_session
     """
     添加作者
     """
-    new_author = Author.model_validate(author)
-    session.add(new_author)
+    # INSERT .. RETURNING省掉refresh的回查SELECT
+    new_author = session.scalar(insert(Author).values(**author.model_dump()).returning(Author))
     session.commit()
-    session.refresh(new_author)
     return new_author
 
 @router.get("/{author_id}")
@@ -1,4 +1,5 @@
 from fastapi import HTTPException, Depends, APIRouter
+from sqlalchemy import insert, update
 from sqlmodel import Session, select
 from schema import BookInput, Book
 from db import get_db_session
@@ -15,10 +16,10 @@ def append_book(book: BookInput, session: Session = Depends(get_db_session)) ->
     # Session 在数据库中一般称之为事务（Transaction），
     # 事务是一个操作的集合，这些操作要么全部成功，要么全部失败。如果有一个失败，之前的操作都会自动回滚。
     # 在这里，我们使用 Session 来管理数据库连接和操作。
-    new_book = Book.model_validate(book)  # 将输入的BookInput转换为Book对象
-    session.add(new_book)
+    # INSERT .. RETURNING一条语句拿回完整新行（含自增ID），
+    # 不再需要add/commit/refresh里refresh那次额外的SELECT
+    new_book = session.scalar(insert(Book).values(**book.model_dump()).returning(Book))
     session.commit()  # 提交事务
-    session.refresh(new_book) # 刷新new_book对象，获取最新的ID等信息
     return new_book
 
 
@@ -74,13 +75,12 @@ def update_book(book_id: int, new_book: BookInput, session: Session = Depends(ge
     """
     更新书籍
     """
-    book = session.get(Book, book_id)
+    # 原来是SELECT取对象、逐字段setattr、commit时再发UPDATE——两次往返加一堆属性事件。
+    # 一条UPDATE .. RETURNING完成：影响0行（RETURNING为空）即书不存在
+    book = session.scalar(
+        update(Book).where(Book.id_ == book_id).values(**new_book.model_dump()).returning(Book)
+    )
     if book is None:
         raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
-    book.name = new_book.name
-    book.isbn = new_book.isbn
-    book.type_ = new_book.type_
-    book.publish = new_book.publish
-    book.price = new_book.price
     session.commit()  # 提交事务
     return book
\ No newline at end of file
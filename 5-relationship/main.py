@@ -1,5 +1,7 @@
+import os
+
 from fastapi import FastAPI
-from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel import SQLModel
 from routers import book, author  # 导入自定义的路由模块
 from db import engine
 import uvicorn
@@ -16,7 +18,14 @@ import uvicorn
 from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
+    # 建表属于一次性的部署步骤，不应该每个worker启动都跑一遍
+    # （workers=N时是N次schema introspection，每张表一条PRAGMA table_info）。
+    # 首次部署/数据库为空时，用 RUN_MIGRATIONS=1 启动一次（或放在容器entrypoint的
+    # 预启动步骤里）完成建表；日常worker冷启动完全不碰DDL。
+    if os.getenv("RUN_MIGRATIONS") == "1":
+        # 异步引擎上执行同步的create_all：run_sync把它调度到驱动的工作线程里
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
     yield
     pass
 
@@ -27,7 +36,21 @@ app.include_router(author.router)  # 将作者相关的路由添加到FastAPI应
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8008, reload=True)  # 启动FastAPI应用，reload=True表示代码修改后自动重启
+    # 生产配置：多worker吃满多核（2n+1经验值），uvloop事件循环+httptools解析器，
+    # 关掉access log（高QPS下每请求一行日志的开销很可观）。
+    # workers>1时必须传"main:app"导入字符串而不是app对象。
+    # 开发调试时可改回 uvicorn.run(app, reload=True)，或用
+    # gunicorn -k uvicorn.workers.UvicornWorker -w $((2*$(nproc)+1)) main:app 部署。
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8008,
+        workers=os.cpu_count() * 2 + 1,
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+        access_log=False,
+    )
 
 # session.get() vs select() 区别：
 
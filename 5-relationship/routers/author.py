@@ -1,7 +1,12 @@
-from fastapi import HTTPException, Depends, APIRouter
-from sqlmodel import Session, select
+from fastapi import HTTPException, Depends, APIRouter, Query
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from schema import AuthorInput, Author, AuthorOutputWithBooks, BookBase, Book
 from db import get_db_session, db_exception_handler
+from routers.book import forget_cached_author
 
 router = APIRouter(prefix="/api/author", tags=["Author"])
 # router 是一个APIRouter实例，用于组织和管理API路由，prefix="/api/author"表示所有路由都以/api/author开头，tags=["Author"]用于在API文档中分组。
@@ -9,14 +14,19 @@ router = APIRouter(prefix="/api/author", tags=["Author"])
 # 有了prefix可以省略掉前缀/api/author，直接使用router的路由方法定义API接口。
 # 可以在router中添加status_code参数来指定返回的HTTP状态码，默认是200 OK。也自定义返回如下：
 # @router.get("/", status_code=204)
+# handler全部是async def：数据库I/O通过await挂起在事件循环上，不再占用线程池线程
 @router.get("/")
 @db_exception_handler
-def get_all_authors(session: Session = Depends(get_db_session)) -> list[Author]:
+async def get_all_authors(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_db_session),
+) -> list[Author]:
     """
-    获取所有作者
+    获取所有作者（limit/offset分页，避免无上限结果集占满内存）
     """
-    query = select(Author)
-    result = session.exec(query).all()
+    query = select(Author).limit(limit).offset(offset)
+    result = (await session.exec(query)).all()
     if not result:
         raise HTTPException(status_code=404, detail="No authors found")
     return result
@@ -25,80 +35,78 @@ def get_all_authors(session: Session = Depends(get_db_session)) -> list[Author]:
 
 @router.post("/")
 @db_exception_handler
-def append_author(author: AuthorInput, session: Session = Depends(get_db_session)) -> Author:
+async def append_author(author: AuthorInput, session: AsyncSession = Depends(get_db_session)) -> Author:
     """
     添加作者
     """
-    new_author = Author.model_validate(author)
-    session.add(new_author)
-    session.commit()
-    session.refresh(new_author)
+    # INSERT .. RETURNING一条语句拿回完整新行（含自增ID），省掉refresh的回查SELECT
+    new_author = await session.scalar(insert(Author).values(**author.model_dump()).returning(Author))
+    await session.commit()
     return new_author
 
 @router.get("/{author_id}")
 @db_exception_handler
-def get_author_by_id(author_id: int, session: Session = Depends(get_db_session)) -> Author:
+async def get_author_by_id(author_id: int, session: AsyncSession = Depends(get_db_session)) -> Author:
     """
     根据ID获取作者
     """
-    author = session.get(Author, author_id)
+    author = await session.get(Author, author_id)
     if author is None:
         raise HTTPException(status_code=404, detail=f"Author with id {author_id} not found")
     return author
 
 @router.delete("/{author_id}")
 @db_exception_handler
-def delete_author(author_id: int, session: Session = Depends(get_db_session)) -> dict:
+async def delete_author(author_id: int, session: AsyncSession = Depends(get_db_session)) -> dict:
     """
     删除作者（改进版）
     """
-    author = session.get(Author, author_id)
-    if author is None:
-        raise HTTPException(status_code=404, detail=f"Author with id {author_id} not found")
-
-    # 检查是否有关联的书籍
-    books_count = session.exec(select(Book).where(Book.author_id == author_id)).first()
-    if books_count:
+    # 一条DELETE完成原来的三次往返：RETURNING为空即作者不存在（404）；
+    # 还有关联书籍时由外键RESTRICT直接拒绝（IntegrityError -> 400），
+    # 不再先SELECT作者、再SELECT关联书籍做应用层检查
+    stmt = delete(Author).where(Author.id_ == author_id).returning(Author.name, Author.nationality)
+    try:
+        deleted = (await session.exec(stmt)).first()
+    except IntegrityError:
+        await session.rollback()
         raise HTTPException(
             status_code=400,
             detail=f"Cannot delete author with id {author_id}: author has associated books"
         )
 
-    try:
-        session.delete(author)
-        session.commit()
-        return {"message": f"Author with id {author_id} deleted successfully"}
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to delete author: {str(e)}")
+    if deleted is None:
+        raise HTTPException(status_code=404, detail=f"Author with id {author_id} not found")
+
+    await session.commit()
+    # 让book模块的作者ID缓存失效，否则添加书籍时会引用已删除的作者
+    forget_cached_author(deleted.name, deleted.nationality)
+    return {"message": f"Author with id {author_id} deleted successfully"}
 
 @router.get("/{author_id}/books")
 @db_exception_handler
-def get_books_by_author(author_id: int, session: Session = Depends(get_db_session)) -> AuthorOutputWithBooks:
-# 也可以使用response model完成类似功能，而不添加AuthorOutputWithBooks类型的返回值，效果是一致的
-# @router.get("/{author_id}/books", response_model=AuthorOutputWithBooks)
-# def get_books_by_author(author_id: int, session: Session = Depends(get_db_session)):
+async def get_books_by_author(author_id: int, session: AsyncSession = Depends(get_db_session)) -> AuthorOutputWithBooks:
     """
     根据作者ID获取该作者的所有书籍
     """
-    author = session.get(Author, author_id)
+    # selectinload在同一次查询往返里预加载author.books（共两条SQL：作者+IN查询书籍），
+    # 避免序列化阶段的惰性加载（N+1问题，且异步会话里会直接抛MissingGreenlet）
+    query = select(Author).where(Author.id_ == author_id).options(selectinload(Author.books))
+    author = (await session.exec(query)).first()
     if author is None:
         raise HTTPException(status_code=404, detail=f"Author with id {author_id} not found")
-    # return 的时候会把Author类型转换为AuthorOutputWithBooks类型，而AuthorOutputWithBooks中有定义books，会触发SQLModel的关系加载，自动加载查询该作者的所有书籍
     return author
 
 @router.post("/{author_id}/books")
 @db_exception_handler
-def append_bood_by_author_id(author_id: int, book: BookBase, session: Session = Depends(get_db_session)) -> Book:
+async def append_bood_by_author_id(author_id: int, book: BookBase, session: AsyncSession = Depends(get_db_session)) -> Book:
     """
     为指定作者添加书籍
     """
-    author = session.get(Author, author_id)
+    author = await session.get(Author, author_id)
     if author is None:
         raise HTTPException(status_code=404, detail=f"Author with id {author_id} not found")
 
-    new_book = Book.model_validate(book, update={"author_id": author_id})
-    session.add(new_book)
-    session.commit()
-    session.refresh(new_book)
-    return new_book
\ No newline at end of file
+    # INSERT .. RETURNING，与append_author同理
+    new_book = await session.scalar(insert(Book).values(**book.model_dump(), author_id=author_id).returning(Book))
+    await session.commit()
+    return new_book
@@ -1,7 +1,12 @@
-from fastapi import HTTPException, Depends, APIRouter
-from sqlmodel import Session, select
+from fastapi import HTTPException, Depends, APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from schema import Book, BookInput, Author
-from db import get_db_session, db_exception_handler
+from db import SessionLocal, get_db_session, db_exception_handler
 from logging import Logger
 
 logger = Logger(__name__)
@@ -9,82 +14,164 @@ logger = Logger(__name__)
 
 router = APIRouter(prefix="/api/book", tags=["Book"])
 
-# 增
-@router.post("/")
-@db_exception_handler
-def append_book(book_input: BookInput, session: Session = Depends(get_db_session)) -> Book:
+# get_books的四种过滤组合各对应一条模块级语句，键为(是否按id过滤, 是否按类型过滤)。
+# 语句对象在进程生命周期内复用，配合引擎的编译缓存（query_cache_size），
+# 避免每个请求都重新构建/重新编译SQL；参数值通过bindparam在执行时传入。
+# limit/offset也走bindparam，分页参数变化不影响语句的缓存命中。
+_GET_BOOKS_STMTS = {
+    (False, False): select(Book),
+    (True, False): select(Book).where(Book.id_ == bindparam("bid")),
+    (False, True): select(Book).where(Book.type_ == bindparam("btype")),
+    (True, True): select(Book).where(Book.id_ == bindparam("bid"), Book.type_ == bindparam("btype")),
+}
+_GET_BOOKS_STMTS = {
+    key: stmt.limit(bindparam("blimit")).offset(bindparam("boffset"))
+    for key, stmt in _GET_BOOKS_STMTS.items()
+}
+
+# 进程内作者ID缓存：(name, nationality) -> author_id。
+# 作者几乎只增不改，缓存命中时添加书籍省掉一次作者SELECT；只缓存已提交的行，
+# 避免事务回滚后留下脏条目。删除作者时记得调用forget_cached_author失效。
+# 注意：多worker部署下其它进程删除作者时本进程无法收到通知，缓存可能指向
+# 已不存在的行——写路径必须捕获外键IntegrityError，失效条目后重建作者重试
+# （见append_book/update_book），否则该作者名会在本进程内永久性写入失败。
+_author_id_cache: dict[tuple[str, str | None], int] = {}
+_AUTHOR_CACHE_MAX = 256
+
+
+def forget_cached_author(name: str, nationality: str | None) -> None:
+    """作者被删除时，让对应的缓存条目失效"""
+    _author_id_cache.pop((name, nationality), None)
+
+
+async def _get_or_create_author_id(session: AsyncSession, name: str, nationality: str | None) -> int:
     """
-    添加书籍
+    查找或创建作者，返回author_id（带进程内缓存）
     """
-    # 检查书籍是否已存在
-    existing_book_stmt = select(Book).where(Book.name == book_input.name)
-    existing_book = session.exec(existing_book_stmt).first() # 注意：这里的first()方法会返回第一个匹配的结果，如果没有匹配的结果则返回None
+    key = (name, nationality)
+    cached = _author_id_cache.get(key)
+    if cached is not None:
+        return cached
 
-
-    if existing_book:
-        raise HTTPException(status_code=400, detail="Book already exists")
-
-    # 查找或创建作者
-    author_stmt = select(Author).where(Author.name == book_input.author, Author.nationality == book_input.author_nationality)
-    existing_author = session.exec(author_stmt).first()
+    author_stmt = select(Author).where(Author.name == name, Author.nationality == nationality)
+    existing_author = (await session.exec(author_stmt)).first()
 
     if existing_author:
-        target_author = existing_author
+        # 已提交的行才进缓存
+        if len(_author_id_cache) >= _AUTHOR_CACHE_MAX:
+            _author_id_cache.clear()
+        _author_id_cache[key] = existing_author.id_
         logger.info(f"Found existing author: {existing_author.name}")
-    else:
-        # 创建新作者
-        author_data = {"name": book_input.author}
-        if book_input.author_nationality:
-            author_data["nationality"] = book_input.author_nationality
-
-        target_author = Author(**author_data)
-        session.add(target_author)
-        session.flush()  # 获取ID但不提交事务
-        logger.info(f"Created new author: {target_author.name} with ID {target_author.id_}")
-
-    # 创建新书籍
+        return existing_author.id_
+
+    # 创建新作者
+    author_data = {"name": name}
+    if nationality:
+        author_data["nationality"] = nationality
+
+    target_author = Author(**author_data)
+    session.add(target_author)
+    await session.flush()  # 获取ID但不提交事务
+    logger.info(f"Created new author: {target_author.name} with ID {target_author.id_}")
+    # 新作者尚未提交，不进缓存（若事务回滚，缓存就指向不存在的行）；下次查到后再缓存
+    return target_author.id_
+
+# 增
+# handler全部是async def：数据库I/O通过await挂起在事件循环上，不再占用线程池线程
+@router.post("/")
+@db_exception_handler
+async def append_book(book_input: BookInput, session: AsyncSession = Depends(get_db_session)) -> Book:
+    """
+    添加书籍
+    """
+    # 查找或创建作者（带缓存，命中时零查询）
     book_data = book_input.model_dump(exclude={"author", "author_nationality"})
-    book_data["author_id"] = target_author.id_
+    book_data["author_id"] = await _get_or_create_author_id(session, book_input.author, book_input.author_nationality)
+
+    # 查重+插入合并为一条语句：书名上有唯一索引，
+    # ON CONFLICT DO NOTHING时RETURNING返回空，即书已存在。
+    # RETURNING直接带回完整的新行，省掉commit后再SELECT一次（refresh）的往返
+    def _insert_stmt():
+        return (
+            sqlite_insert(Book)
+            .values(**book_data)
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(Book)
+        )
 
-    new_book = Book(**book_data)
-    session.add(new_book)
+    try:
+        new_book = (await session.exec(_insert_stmt())).scalars().first()
+    except IntegrityError:
+        # 缓存的author_id可能指向已被其它worker删除的作者（外键约束报错）。
+        # 回滚后失效缓存条目，重查/重建作者，再重试一次插入；重试再失败
+        # 就交给db_exception_handler按500处理
+        await session.rollback()
+        forget_cached_author(book_input.author, book_input.author_nationality)
+        book_data["author_id"] = await _get_or_create_author_id(session, book_input.author, book_input.author_nationality)
+        new_book = (await session.exec(_insert_stmt())).scalars().first()
+
+    if new_book is None:
+        raise HTTPException(status_code=400, detail="Book already exists")
 
-    # 统一提交事务
-    session.commit()
-    session.refresh(new_book)
+    await session.commit()
 
     logger.info(f"Successfully created book: {new_book.name}")
     return new_book
 
 @router.get("/")
 @db_exception_handler
-def get_books(book_id: int | None = None, book_type: str | None = None, session: Session = Depends(get_db_session)) -> list[Book]:
+async def get_books(
+    book_id: int | None = None,
+    book_type: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_db_session),
+) -> list[Book]:
     """
-    获取书籍 - 支持条件查询和获取全部
+    获取书籍 - 支持条件查询和分页（limit/offset），全量导出请用 /export
     """
-    filters = []
+    stmt = _GET_BOOKS_STMTS[(book_id is not None, book_type is not None)]
+    params = {"blimit": limit, "boffset": offset}
     if book_id is not None:
-        filters.append(Book.id_ == book_id)  # 注意：去掉下划线
+        params["bid"] = book_id
     if book_type is not None:
-        filters.append(Book.type_ == book_type)  # 注意：去掉下划线
-
-    query = select(Book)
-    if filters:
-        query = query.where(*filters)
+        params["btype"] = book_type
 
-    result = session.exec(query).all()
+    result = (await session.exec(stmt, params=params)).all()
     if not result:
         raise HTTPException(status_code=404, detail="No books found")
     return result
 
+# 全量导出：流式返回NDJSON（每行一个JSON对象）。
+# 服务端内存只驻留yield_per=500行，而不是把整个结果集.all()进内存再一次性序列化。
+# 注意该路由必须注册在/{book_id}之前，否则"export"会被当成book_id解析。
+@router.get("/export")
+async def export_books() -> StreamingResponse:
+    """
+    流式导出全部书籍（NDJSON格式）
+    """
+    async def generate_ndjson():
+        # 不能用Depends注入的session：FastAPI 0.106起依赖的清理代码在响应体发送之前执行，
+        # 注入的会话在生成器开始迭代前就已关闭，连接会泄漏。流式响应要在生成器内自管会话。
+        async with SessionLocal() as session:
+            result = await session.stream_scalars(select(Book).execution_options(yield_per=500))
+            try:
+                async for book in result:
+                    yield book.model_dump_json() + "\n"
+            finally:
+                await result.close()  # 显式归还流式游标占用的连接（客户端中途断开时也要归还）
+
+    return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+
+
 # 查，通过主键查询，使用session.get()方法更加高效
 @router.get("/{book_id}")
 @db_exception_handler
-def get_book_by_id(book_id: int, session: Session = Depends(get_db_session)) -> Book:
+async def get_book_by_id(book_id: int, session: AsyncSession = Depends(get_db_session)) -> Book:
     """
     根据ID获取书籍
     """
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if book is None:
         raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
     return book
@@ -92,67 +179,57 @@ def get_book_by_id(book_id: int, session: Session = Depends(get_db_session)) ->
 
 @router.delete("/{book_id}")
 @db_exception_handler
-def delete_book(book_id: int, session: Session = Depends(get_db_session)) -> str:
+async def delete_book(book_id: int, session: AsyncSession = Depends(get_db_session)) -> str:
     """
     删除书籍
     """
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if book is None:
         raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
-    session.delete(book)
-    session.commit()
+    await session.delete(book)
+    await session.commit()
     return f"Book with id {book_id} deleted successfully"
 
 
 
 @router.put("/{book_id}")
-def update_book(book_id: int, new_book: BookInput, session: Session = Depends(get_db_session)) -> Book:
+async def update_book(book_id: int, new_book: BookInput, session: AsyncSession = Depends(get_db_session)) -> Book:
     """
     更新书籍
     """
     try:
-        # 查找现有作者
-        author_stmt = select(Author).where(
-            Author.name == new_book.author,
-            Author.nationality == new_book.author_nationality
-        )
-        existing_author = session.exec(author_stmt).first()
-
-        if existing_author:
-            target_author = existing_author
-        else:
-            # 创建新作者 - 修复属性名
-            author_data = {
-                "name": new_book.author,
-                "nationality": new_book.author_nationality  # 修复：使用正确的属性名
-            }
-            target_author = Author(**author_data)
-            session.add(target_author)
-            session.flush()  # 确保获得ID
-            session.refresh(target_author)  # 添加：刷新对象确保所有属性可用
-            logger.info(f"Created new author: {target_author.name} with ID {target_author.id_}")
-
-        # 查找要更新的书籍
-        book = session.get(Book, book_id)
-        if book is None:
-            raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
+        # 查找或创建作者（与append_book共用缓存）
+        author_id = await _get_or_create_author_id(session, new_book.author, new_book.author_nationality)
 
         # 准备更新数据
         new_book_data = new_book.model_dump(exclude={"author", "author_nationality"})
-        new_book_data["author_id"] = target_author.id_
-
-        # 更新书籍属性
-        for key, value in new_book_data.items():
-            setattr(book, key, value)
+        new_book_data["author_id"] = author_id
+
+        # 原来是SELECT取对象、逐字段setattr、commit、refresh再SELECT——三次往返。
+        # 一条UPDATE .. RETURNING完成：影响0行（RETURNING为空）即书不存在
+        try:
+            book = await session.scalar(
+                update(Book).where(Book.id_ == book_id).values(**new_book_data).returning(Book)
+            )
+        except IntegrityError:
+            # 同append_book：缓存的author_id可能已被其它worker删除，
+            # 失效缓存后重建作者并重试一次
+            await session.rollback()
+            forget_cached_author(new_book.author, new_book.author_nationality)
+            new_book_data["author_id"] = await _get_or_create_author_id(session, new_book.author, new_book.author_nationality)
+            book = await session.scalar(
+                update(Book).where(Book.id_ == book_id).values(**new_book_data).returning(Book)
+            )
+        if book is None:
+            raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
 
-        session.commit()
-        session.refresh(book)  # 添加：刷新书籍对象
+        await session.commit()
         return book
 
     except HTTPException:
-        session.rollback()
+        await session.rollback()
         raise
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         logger.error(f"Error updating book: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
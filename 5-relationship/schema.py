@@ -1,12 +1,14 @@
 
 
+from sqlalchemy import UniqueConstraint
 from sqlmodel import Field, SQLModel, Relationship
 
 
 class BookBase(SQLModel):
-    name: str
+    # 书名唯一：唯一索引让数据库层面兜底查重，API可以用INSERT .. ON CONFLICT一条语句完成"查重+插入"
+    name: str = Field(index=True, unique=True)
     isbn: str
-    type_: str
+    type_: str = Field(index=True)  # get_books按类型过滤，建索引避免全表扫描
     publish: str
     price: float
 
@@ -41,7 +43,9 @@ class BookInput(BookBase):
 class Book(BookBase, table=True):
     id_: int | None = Field(default=None, primary_key=True)
     author: "Author" = Relationship(back_populates="books")
-    author_id: int = Field(foreign_key="author.id_")
+    # 外键加索引：按作者查书（selectinload、delete_author的关联检查）都走这一列。
+    # ondelete="RESTRICT"：还有书的作者由数据库直接拒绝删除（需PRAGMA foreign_keys=ON）
+    author_id: int = Field(foreign_key="author.id_", index=True, ondelete="RESTRICT")
 
     class Config:
         json_schema_extra = {
@@ -68,8 +72,10 @@ class AuthorInput(SQLModel):
         }
 
 class Author(AuthorInput, table=True):
+    # 同名同国籍视为同一作者，数据库层面保证不重复
+    __table_args__ = (UniqueConstraint("name", "nationality", name="uq_author_name_nationality"),)
     id_: int | None = Field(default=None, primary_key=True)
-# 
+#
     books: list[Book] = Relationship(back_populates="author")
     class Config:
         json_schema_extra = {
@@ -1,3 +1,4 @@
+import os
 from getpass import getpass
 
 from sqlmodel import SQLModel, Session, create_engine
@@ -8,7 +9,7 @@ from schema import User
 engine = create_engine(
     "sqlite:///books.db",
     connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=True # Log generated SQL
+    echo=os.getenv("SQL_ECHO", "") == "1"  # Log generated SQL only when debugging
 )
 
 
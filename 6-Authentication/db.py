@@ -1,3 +1,5 @@
+import os
+
 from fastapi import HTTPException
 from sqlmodel import create_engine, Session
 from sqlalchemy.exc import SQLAlchemyError
@@ -6,7 +8,21 @@ from logging import Logger
 
 logger = Logger(__name__)  # 创建一个日志记录器，__name__表示当前模块的名称
 
-engine = create_engine("sqlite:///books.db", echo=True, connect_args={"check_same_thread": False}) # SQLite数据库引擎，echo=True表示打印SQL语句，建议只在测试环境使用这个参数，connect_args={"check_same_thread": False}表示允许多线程访问
+# echo每条SQL都要构造语句字符串+参数repr再写日志，压测时开销可观，
+# 只在调试时用环境变量SQL_ECHO=1打开；connect_args={"check_same_thread": False}表示允许多线程访问。
+# 连接池调优：默认QueuePool只有pool_size=5，认证高并发时请求会排队等连接；
+# 池大小用环境变量暴露给运维，pool_use_lifo=True优先复用最热的连接，
+# pool_pre_ping剔除死连接，pool_recycle防止连接老化。
+engine = create_engine(
+    "sqlite:///books.db",
+    echo=os.getenv("SQL_ECHO", "") == "1",
+    connect_args={"check_same_thread": False},
+    pool_size=int(os.getenv("DB_POOL_SIZE", "25")),
+    max_overflow=int(os.getenv("DB_POOL_OVERFLOW", "25")),
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    pool_use_lifo=True,
+)
 def get_db_session():
     """
     获取数据库会话
@@ -27,7 +27,9 @@ app.include_router(author.router)  # 将作者相关的路由添加到FastAPI应
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8008, reload=True)  # 启动FastAPI应用，reload=True表示代码修改后自动重启
+    # loop="uvloop": libuv-backed event loop from uvicorn[standard], several
+    # times faster at context switches than CPython's default asyncio loop
+    uvicorn.run(app, host="0.0.0.0", port=8008, reload=True, loop="uvloop")  # 启动FastAPI应用，reload=True表示代码修改后自动重启
 
 # session.get() vs select() 区别：
 
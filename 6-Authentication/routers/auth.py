@@ -1,10 +1,23 @@
+import hmac
+import os
+import threading
+import time
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlmodel import Session, select
+from sqlalchemy import update as sa_update
+from sqlmodel import Session
 from starlette import status
 
 from db import get_db_session
-from schema import UserOutput, User
+from schema import (
+    User,
+    UserOutput,
+    get_user_credentials_raw,
+    hash_needs_update,
+    hash_password,
+    verify_password_hash,
+)
 
 # ============ Step 1: Security Scheme Definition ============
 security = HTTPBasic()
@@ -16,6 +29,40 @@ HTTPBasic object functions:
 4. If no authentication info provided, automatically returns 401 status code
 """
 
+# ============ Step 2: Verified-Credentials Cache ============
+# bcrypt verification is deliberately slow (tens to hundreds of ms of pure CPU)
+# and HTTP Basic resends the same credentials on EVERY request, so without a
+# cache the password hash dominates every authenticated route.
+# Cache key is (username, HMAC-SHA256(pepper, password)) -> the plaintext
+# password is never stored, and without the pepper nobody can precompute keys
+# to probe or poison the cache. The pepper is random per process by default;
+# set AUTH_CACHE_PEPPER only if you need deterministic keys (e.g. tests).
+# FAILED verifications are cached too (as None): the key includes the
+# password digest, so repeating the same wrong password burns bcrypt once
+# per TTL instead of on every request, and unknown and known usernames stay
+# timing-identical across repeated attempts.
+# Entries expire after a short TTL so a password change locks out old
+# credentials within a minute; call forget_user() to invalidate immediately.
+# This is a controlled weakening: an identical replayed credential is
+# accepted (or rejected) for up to TTL seconds without re-running bcrypt,
+# but there is no offline cracking advantage - no hash material is cached.
+_CACHE_PEPPER = os.environ.get("AUTH_CACHE_PEPPER", "").encode() or os.urandom(32)
+_VERIFIED_TTL_SECONDS = 60.0
+_VERIFIED_MAX_ENTRIES = 10_000
+_verified_cache: dict[tuple[str, str], tuple[float, UserOutput | None]] = {}
+_verified_cache_lock = threading.Lock()  # handlers run in the threadpool, guard the dict
+
+
+def _cache_key(username: str, password: str) -> tuple[str, str]:
+    return username, hmac.new(_CACHE_PEPPER, password.encode(), "sha256").hexdigest()
+
+
+def forget_user(username: str) -> None:
+    """Drop all cached credentials for a user (call after a password change)."""
+    with _verified_cache_lock:
+        for key in [k for k in _verified_cache if k[0] == username]:
+            del _verified_cache[key]
+
 
 # ============ Step 3: User Authentication Dependency ============
 def get_current_user(
@@ -40,18 +87,67 @@ def get_current_user(
     - If exception is raised, route function never executes
     """
 
+    # Fast path: these exact credentials were checked recently (either way).
+    # A dict lookup replaces one SELECT plus one bcrypt verify.
+    cache_key = _cache_key(credentials.username, credentials.password)
+    now = time.monotonic()
+    with _verified_cache_lock:
+        cached = _verified_cache.get(cache_key)
+        if cached is not None and now - cached[0] < _VERIFIED_TTL_SECONDS:
+            if cached[1] is None:  # cached rejection of this exact credential
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Incorrect username or password",
+                    headers={"WWW-Authenticate": "Basic"},
+                )
+            return cached[1]
+
     # Query database for user by username
     # credentials.username and credentials.password are automatically populated by security
-    query = select(User).where(User.username == credentials.username)
-    user = session.exec(query).first()
+    # Core-level lookup: returns a plain (id, username, password_hash) row,
+    # skipping ORM instance construction on this per-request hot path
+    row = get_user_credentials_raw(session, credentials.username)
+
+    # Run the full-cost verify even when the username does not exist: a
+    # missing hash routes to the backend's same-cost dummy hash, so "unknown
+    # user" takes exactly as long as "known user, wrong password". Skipping
+    # the verify for unknown users (if row and verify...) would answer in
+    # microseconds and let an attacker enumerate usernames by timing.
+    password_ok = verify_password_hash(
+        credentials.password, row.password_hash if row else None
+    )
 
     # Verify user exists and password is correct
-    if user and user.verify_password(credentials.password):
+    if row and password_ok:
+        # Transparent hash upgrade: if BCRYPT_ROUNDS was raised since this
+        # hash was made, rehash now - a successful verify is the only moment
+        # the plaintext is in hand. One extra hash cost on this login only;
+        # the whole user base migrates gradually with no flag-day script.
+        if hash_needs_update(row.password_hash):
+            session.execute(
+                sa_update(User.__table__)
+                .where(User.__table__.c.username == row.username)
+                .values(password_hash=hash_password(credentials.password))
+            )
+            session.commit()
+        # UserOutput is a slotted dataclass now - plain construction, no
+        # pydantic validation pass on this per-request path
+        user_output = UserOutput(id=row.id, username=row.username)
+        with _verified_cache_lock:
+            if len(_verified_cache) >= _VERIFIED_MAX_ENTRIES:
+                _verified_cache.clear()  # crude but bounded; a full wipe just re-verifies
+            _verified_cache[cache_key] = (now, user_output)
         # CRITICAL: This return value is what gets injected into route functions
         # The UserOutput object will be passed to any route that depends on get_current_user
-        return UserOutput.model_validate(user)
+        return user_output
     else:
-        # Authentication failed - raise 401 exception
+        # Authentication failed - cache the rejection so replaying the same
+        # bad credential does not burn a full bcrypt verify every time
+        with _verified_cache_lock:
+            if len(_verified_cache) >= _VERIFIED_MAX_ENTRIES:
+                _verified_cache.clear()
+            _verified_cache[cache_key] = (now, None)
+        # Raise 401 exception
         # This stops execution - route function will never be called
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,3 +155,22 @@ def get_current_user(
             headers={"WWW-Authenticate": "Basic"},  # Tells client to use Basic auth
         )
 
+
+# ============ Step 4: Combined Session + Auth Dependency ============
+def get_authed_session(
+    credentials: HTTPBasicCredentials = Depends(security),
+    session: Session = Depends(get_db_session),
+) -> tuple[Session, UserOutput]:
+    """
+    One dependency for routes that need both a database session and an
+    authenticated user. The auth lookup runs on the SAME session the handler
+    will use, so a route can never end up with auth and its own queries on
+    two different sessions/connections. Declaring the two separately also
+    works (FastAPI caches get_db_session per request), but this makes the
+    sharing explicit and resolves everything in a single dependency call.
+
+    Usage: authed: tuple[Session, UserOutput] = Depends(get_authed_session)
+    """
+    user = get_current_user(credentials, session)
+    return session, user
+
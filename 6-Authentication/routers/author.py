@@ -1,6 +1,7 @@
 from fastapi import HTTPException, Depends, APIRouter
+from fastapi.responses import ORJSONResponse
 from sqlmodel import Session, select
-from schema import AuthorInput, Author, AuthorOutputWithBooks, BookBase, Book
+from schema import AuthorInput, Author, AuthorOutputWithBooks, BookBase, Book, dump_author
 from db import get_db_session, db_exception_handler
 
 router = APIRouter(prefix="/api/author", tags=["Author"])
@@ -19,7 +20,9 @@ def get_all_authors(session: Session = Depends(get_db_session)) -> list[Author]:
     result = session.exec(query).all()
     if not result:
         raise HTTPException(status_code=404, detail="No authors found")
-    return result
+    # 直接返回Response跳过逐行的response model校验；dump_author是按Author的
+    # 固定形状预编译的直线式dump，orjson在C层完成编码
+    return ORJSONResponse([dump_author(a) for a in result])
 
 # 还有一种在函数体中变更response status code的方式： https://fastapi.tiangolo.com/advanced/response-change-status-code/
 
@@ -29,6 +32,8 @@ def append_author(author: AuthorInput, session: Session = Depends(get_db_session
     """
     添加作者
     """
+    # 注意：ORM表模型不能用model_construct跳过校验——绕过__init__会丢掉
+    # SQLAlchemy的instrumentation，对象无法session.add
     new_author = Author.model_validate(author)
     session.add(new_author)
     session.commit()
@@ -18,4 +18,4 @@ def on_startup():
 
 
 if __name__ == "__main__":
-    uvicorn.run("book:app", reload=True)
+    uvicorn.run("book:app", reload=True, loop="uvloop")
@@ -1,8 +1,22 @@
+from functools import lru_cache
+
 from sqlmodel import SQLModel, Field, Column, VARCHAR
 
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"])
+@lru_cache(maxsize=1)
+def _pwd_context():
+    # Lazy singleton: CryptContext construction probes the bcrypt backend and
+    # builds the scheme registry (~tens of ms). Importing schema.py happens in
+    # every worker at boot, but the context is only built on the first actual
+    # hash/verify call - workers that never serve auth skip it entirely.
+    # bcrypt_sha256 prehashes the password with HMAC-SHA256 (microseconds,
+    # SHA-NI accelerated) before bcrypt sees it: bcrypt's own 72-byte
+    # truncation and length-handling paths are skipped, and longer passwords
+    # no longer silently collide on their first 72 bytes. Plain bcrypt stays
+    # listed so existing $2b$ hashes keep verifying; deprecated="auto" marks
+    # them for rehash-on-login via needs_update.
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt_sha256", "bcrypt"], deprecated="auto")
 
 class BookInput(SQLModel):
     name: str
@@ -42,10 +56,10 @@ class User(SQLModel, table=True):
     password_hash: str = ''
 
     def set_password(self, password):
-        self.password_hash = pwd_context.hash(password)
+        self.password_hash = _pwd_context().hash(password)
 
     def verify_password(self, password):
-        return pwd_context.verify(password, self.password_hash)
+        return _pwd_context().verify(password, self.password_hash)
 
 
 class UserOutput(SQLModel):